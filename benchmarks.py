@@ -0,0 +1,276 @@
+"""
+Benchmarks of IR generation, compilation and call overhead.
+
+    python benchmarks.py --output results.json
+    python benchmarks.py --compare results.json --threshold 0.1
+
+Every benchmark is timed `repeat` times, each timing covers `number`
+runs of the measured code after a fresh setup.  Results are stored as
+JSON with seconds per run; regressions are detected on the best (min)
+time, which is the least noisy one.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from ctypes import c_double, c_int64, c_void_p
+
+import llvmlite
+import llvmlite.binding as llvm
+from llvmlite import ir
+
+from llvm_operations import compile_ir, create_execution_engine, get_func
+from profiling import Profiler
+from pyobject import define_pyobjects_system, define_PyType_Type, define_PyBaseObject_Type
+
+
+int64 = ir.IntType(64)
+double = ir.DoubleType()
+void_p = ir.IntType(8).as_pointer()
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str, number: int = 1, repeat: int = 20):
+    """
+    Register a benchmark.  The decorated function is the setup: it
+    returns the callable to measure, which is then run `number` times.
+    """
+    def register(setup):
+        BENCHMARKS[name] = (setup, number, repeat)
+        return setup
+    return register
+
+
+def object_model_module() -> ir.Module:
+    module = ir.Module("bench", context=ir.Context())
+    define_pyobjects_system(module)
+    define_PyType_Type(module)
+    define_PyBaseObject_Type(module)
+    return module
+
+
+def functions_module(name: str, signatures: dict, profiler: Profiler = None) -> ir.Module:
+    """
+    Module with a function per signature, each returning its first
+    argument (or a constant for functions without arguments).
+    """
+    module = ir.Module(name, context=ir.Context())
+    for func_name, (rettype, argtypes) in signatures.items():
+        function = ir.Function(module, ir.FunctionType(rettype, argtypes), func_name)
+        builder = ir.IRBuilder(function.append_basic_block())
+        builder.ret(function.args[0] if argtypes else rettype(0))
+        if profiler is not None:
+            profiler.instrument(function)
+    return module
+
+
+CALL_SIGNATURES = {
+    "noargs": (int64, []),
+    "i64": (int64, [int64]),
+    "i64_x4": (int64, [int64] * 4),
+    "double_x2": (double, [double, double]),
+    "pointer": (void_p, [void_p]),
+}
+CTYPES = {int64: c_int64, double: c_double, void_p: c_void_p}
+CALL_ARGS = {
+    "noargs": (),
+    "i64": (1,),
+    "i64_x4": (1, 2, 3, 4),
+    "double_x2": (1.0, 2.0),
+    "pointer": (None,),
+}
+
+
+@benchmark("ir.define_pyobjects_system")
+def bench_define_pyobjects_system():
+    module = ir.Module("bench", context=ir.Context())
+    return lambda: define_pyobjects_system(module)
+
+
+@benchmark("ir.define_PyType_Type")
+def bench_define_PyType_Type():
+    module = ir.Module("bench", context=ir.Context())
+    define_pyobjects_system(module)
+    return lambda: define_PyType_Type(module)
+
+
+@benchmark("ir.define_PyBaseObject_Type")
+def bench_define_PyBaseObject_Type():
+    module = ir.Module("bench", context=ir.Context())
+    define_pyobjects_system(module)
+    define_PyType_Type(module)
+    return lambda: define_PyBaseObject_Type(module)
+
+
+@benchmark("ir.str", number=5)
+def bench_ir_str():
+    module = object_model_module()
+    return lambda: str(module)
+
+
+@benchmark("ir.parse_assembly", number=5)
+def bench_parse_assembly():
+    llvm_ir = str(object_model_module())
+    return lambda: llvm.parse_assembly(llvm_ir)
+
+
+@benchmark("compile_ir.single")
+def bench_compile_ir_single():
+    llvm_ir = str(object_model_module())
+    engine = create_execution_engine()
+    return lambda: compile_ir(engine, llvm_ir)
+
+
+@benchmark("compile_ir.many", repeat=5)
+def bench_compile_ir_many():
+    modules = [
+        str(functions_module(f"bench{i}", {f"f{i}_{name}": sig for name, sig in CALL_SIGNATURES.items()}))
+        for i in range(50)
+    ]
+    engine = create_execution_engine()
+
+    def compile_many():
+        for llvm_ir in modules:
+            compile_ir(engine, llvm_ir)
+    return compile_many
+
+
+@benchmark("get_func", number=1000)
+def bench_get_func():
+    engine = create_execution_engine()
+    compile_ir(engine, str(functions_module("bench", CALL_SIGNATURES)))
+    return lambda: get_func(engine, "i64", c_int64, (c_int64,))
+
+
+def register_call_benchmark(name: str, profiler_options: dict = None, suffix: str = ""):
+    rettype, argtypes = CALL_SIGNATURES[name]
+    args = CALL_ARGS[name]
+
+    @benchmark(f"call.{name}{suffix}", number=100000, repeat=10)
+    def bench_call():
+        profiler = Profiler(**profiler_options) if profiler_options is not None else None
+        engine = create_execution_engine()
+        compile_ir(engine, str(functions_module("bench", {name: (rettype, argtypes)}, profiler)))
+        cfunc = get_func(engine, name, CTYPES[rettype], [CTYPES[argtype] for argtype in argtypes])
+        # The default argument keeps the engine alive while the function is called
+        return lambda engine=engine: cfunc(*args)
+
+
+for call_name in CALL_SIGNATURES:
+    register_call_benchmark(call_name)
+register_call_benchmark("i64", {"timing": False}, ".profiled")
+register_call_benchmark("i64", {"timing": True}, ".profiled_timing")
+
+
+def run_benchmark(setup, number: int, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        func = setup()
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - started) / number)
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def run(pattern: str = "") -> dict:
+    results = {}
+    for name, (setup, number, repeat) in BENCHMARKS.items():
+        if pattern not in name:
+            continue
+        results[name] = run_benchmark(setup, number, repeat)
+        print(f"{name:<36} min {results[name]['min']*1e6:>12.3f} us"
+              f"  median {results[name]['median']*1e6:>12.3f} us", file=sys.stderr)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "llvmlite": llvmlite.__version__,
+            "llvm": ".".join(map(str, llvm.llvm_version_info)),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "benchmarks": results,
+    }
+
+
+# Build information that must match for timings to be comparable
+COMPARED_META = ("python", "llvmlite", "llvm", "platform")
+
+
+def compare(results: dict, baseline: dict, threshold: float):
+    """
+    Return `(name, baseline min, current min, ratio)` for benchmarks
+    which became slower than the baseline by more than threshold.
+    """
+    regressions = []
+    for name, result in results["benchmarks"].items():
+        base = baseline["benchmarks"].get(name)
+        if base is None:
+            continue
+        ratio = result["min"] / base["min"]
+        if ratio > 1 + threshold:
+            regressions.append((name, base["min"], result["min"], ratio))
+    return regressions
+
+
+def differences(results: dict, baseline: dict, pattern: str = ""):
+    """
+    Return warnings about what makes the results not comparable with
+    the baseline: a different build, or benchmarks present in only one
+    of them.  Baseline benchmarks not matching pattern were not run
+    and are ignored.
+    """
+    warnings = []
+    for key in COMPARED_META:
+        current, base = results["meta"].get(key), baseline.get("meta", {}).get(key)
+        if current != base:
+            warnings.append(f"{key} differs: baseline {base}, current {current}")
+    current_names = set(results["benchmarks"])
+    base_names = {name for name in baseline["benchmarks"] if pattern in name}
+    for name in sorted(current_names - base_names):
+        warnings.append(f"benchmark added: {name}")
+    for name in sorted(base_names - current_names):
+        warnings.append(f"benchmark removed: {name}")
+    return warnings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", "-o", help="file to write JSON results to (stdout by default)")
+    parser.add_argument("--compare", "-c", help="JSON results of a previous run to compare with")
+    parser.add_argument("--threshold", "-t", type=float, default=0.1,
+                        help="relative slowdown reported as a regression (default: 0.1)")
+    parser.add_argument("--filter", "-k", default="", help="run only benchmarks containing this substring")
+    args = parser.parse_args(argv)
+
+    results = run(args.filter)
+    dump = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(dump + "\n")
+    else:
+        print(dump)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        for warning in differences(results, baseline, args.filter):
+            print(f"WARNING {warning}", file=sys.stderr)
+        regressions = compare(results, baseline, args.threshold)
+        for name, base, current, ratio in regressions:
+            print(f"REGRESSION {name}: {base*1e6:.3f} us -> {current*1e6:.3f} us ({ratio:.2f}x)", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
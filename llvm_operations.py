@@ -2,6 +2,9 @@ from ctypes import CFUNCTYPE
 
 import llvmlite.binding as llvm
 
+from perf_map import PerfMap
+from profiling import Profiler
+
 
 # All these initializations are required for code generation!
 llvm.initialize()
@@ -9,11 +12,13 @@ llvm.initialize_native_target()
 llvm.initialize_native_asmprinter()  # yes, even this one
 
 
-def create_execution_engine() -> llvm.ExecutionEngine:
+def create_execution_engine(perf_map: PerfMap = None) -> llvm.ExecutionEngine:
     """
     Create an ExecutionEngine suitable for JIT code generation on
     the host CPU.  The engine is reusable for an arbitrary number of
     modules.
+    If perf_map is given it is attached to the engine, so compiled
+    functions can be written to it.
     """
     # Create a target machine representing the host
     target = llvm.Target.from_default_triple()
@@ -21,24 +26,47 @@ def create_execution_engine() -> llvm.ExecutionEngine:
     # And an execution engine with an empty backing module
     backing_mod = llvm.parse_assembly("")
     engine = llvm.create_mcjit_compiler(backing_mod, target_machine)
+    if perf_map is not None:
+        perf_map.attach(engine)
     return engine
 
 
-def compile_ir(engine: llvm.ExecutionEngine, llvm_ir) -> llvm.ModuleRef:  # flake8: noqa
+def compile_ir(engine: llvm.ExecutionEngine, llvm_ir, perf_map: PerfMap = None, profiler: Profiler = None) -> llvm.ModuleRef:  # flake8: noqa
     """
     Compile the LLVM IR string with the given engine.
     The compiled module object is returned.
+    Functions of the module are registered in perf_map and their
+    counters are bound in profiler if they are given.
     """
     # Create a LLVM module object from the IR
     mod = llvm.parse_assembly(llvm_ir)
     mod.verify()
+    if perf_map is not None:
+        # Fails if another map owns the engine, before the module is added
+        perf_map.attach(engine)
     # Now add the module and make sure it is ready for execution
     engine.add_module(mod)
     engine.finalize_object()
     engine.run_static_constructors()
+    if perf_map is not None:
+        perf_map.register(engine, mod)
+    if profiler is not None:
+        profiler.bind(engine, mod)
     return mod
 
 
+def unload_module(engine: llvm.ExecutionEngine, mod: llvm.ModuleRef, perf_map: PerfMap = None, profiler: Profiler = None):
+    """
+    Remove the compiled module from the engine and its functions
+    from perf_map and profiler if they are given.
+    """
+    if profiler is not None:
+        profiler.unbind(mod)
+    engine.remove_module(mod)
+    if perf_map is not None:
+        perf_map.unregister(mod)
+
+
 def get_func(engine: llvm.ExecutionEngine, name: str, rettype, argtypes=()):
     func_ptr = engine.get_function_address(name)
     cfunc = CFUNCTYPE(rettype, *argtypes)(func_ptr)
@@ -0,0 +1,112 @@
+import os
+import struct
+import weakref
+
+import llvmlite.binding as llvm
+
+
+ELF_MAGIC = b"\x7fELF"
+ELFCLASS64 = 2
+ELFDATA2LSB = 1
+SHT_SYMTAB = 2
+STT_FUNC = 2
+SHN_UNDEF = 0
+
+
+def elf_function_sizes(buffer: bytes):
+    """
+    Yield `(name, size)` for every function defined in the ELF64
+    (little endian) object file stored in the buffer.
+    Other object formats yield nothing.
+    """
+    if buffer[:4] != ELF_MAGIC or buffer[4] != ELFCLASS64 or buffer[5] != ELFDATA2LSB:
+        return
+    shoff, = struct.unpack_from("<Q", buffer, 0x28)
+    shentsize, shnum = struct.unpack_from("<HH", buffer, 0x3A)
+    sections = [
+        struct.unpack_from("<IIQQQQIIQQ", buffer, shoff + i*shentsize)
+        for i in range(shnum)
+    ]
+    for _, sh_type, _, _, sh_offset, sh_size, sh_link, _, _, sh_entsize in sections:
+        if sh_type != SHT_SYMTAB:
+            continue
+        strtab_offset = sections[sh_link][4]
+        for offset in range(sh_offset, sh_offset + sh_size, sh_entsize):
+            st_name, st_info, _, st_shndx, _, st_size = struct.unpack_from("<IBBHQQ", buffer, offset)
+            if st_info & 0xf != STT_FUNC or st_shndx == SHN_UNDEF or not st_size:
+                continue
+            name_start = strtab_offset + st_name
+            name_end = buffer.index(b"\0", name_start)
+            yield buffer[name_start:name_end].decode(), st_size
+
+
+# Engine -> the PerfMap attached to it.  An engine has a single object
+# cache hook, so it can be owned by one map only.
+_owners = weakref.WeakKeyDictionary()
+
+
+class PerfMap:
+    """
+    Writer of the `/tmp/perf-<pid>.map` file which Linux `perf` reads
+    to symbolize JIT-compiled code.  Every line is
+    `<start address> <size> <name>` in hex.
+
+    The file is only appended to, so it can be shared with other
+    writers in the process and lines of unloaded modules are kept:
+    perf reads the map when the report is made, not while samples are
+    recorded.  If an address range is reused by later code, both names
+    stay in the map and perf may attribute samples of the range to
+    either of them; telling loads apart needs jitdump records.
+
+    Function sizes are taken from the object files emitted by MCJIT,
+    so the map must be attached to an engine before a module is
+    finalized in it.
+    """
+
+    def __init__(self, path: str = None, truncate: bool = False):
+        self.path = path or f"/tmp/perf-{os.getpid()}.map"
+        self._sizes = weakref.WeakKeyDictionary()  # module -> {function name: size}
+        if truncate:
+            # Drop entries left by a previous process with the same pid
+            os.close(self._open(os.O_TRUNC))
+
+    def _open(self, flags: int = 0) -> int:
+        # The default path is predictable, so never follow a planted symlink
+        return os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND | os.O_NOFOLLOW | flags, 0o600)
+
+    def attach(self, engine: llvm.ExecutionEngine):
+        owner = _owners.get(engine)
+        if owner is self:
+            return
+        if owner is not None:
+            raise RuntimeError("Another PerfMap is already attached to the engine")
+        engine.set_object_cache(notify_func=self._object_compiled)
+        _owners[engine] = self
+
+    def _object_compiled(self, module: llvm.ModuleRef, buffer: bytes):
+        self._sizes[module] = dict(elf_function_sizes(buffer))
+
+    def register(self, engine: llvm.ExecutionEngine, module: llvm.ModuleRef):
+        """
+        Append entries for all functions of the module finalized in the
+        engine.
+        """
+        if _owners.get(engine) is not self:
+            raise RuntimeError("PerfMap is not attached to the engine")
+        sizes = self._sizes.pop(module, None)
+        if sizes is None:
+            raise RuntimeError(f"Module {module.name!r} was not compiled with PerfMap attached")
+        entries = []
+        for name, size in sizes.items():
+            address = engine.get_function_address(name)
+            if address:
+                entries.append(f"{address:x} {size:x} {name}\n")
+        with os.fdopen(self._open(), "a") as file:
+            file.writelines(entries)
+
+    def unregister(self, module: llvm.ModuleRef):
+        """
+        Forget the module.  Its lines stay in the map, so samples taken
+        while it was loaded are still symbolized.
+        """
+        self._sizes.pop(module, None)
@@ -0,0 +1,138 @@
+from collections import namedtuple
+from ctypes import Structure, c_uint64
+
+import llvmlite.binding as llvm
+from llvmlite import ir
+
+
+int32 = ir.IntType(32)
+int64 = ir.IntType(64)
+
+# Layout of a per-function counters global: { calls, cycles }
+counters_t = ir.LiteralStructType([int64, int64])
+
+
+class ProfileCounters(Structure):
+    _fields_ = [
+        ("calls", c_uint64),
+        ("cycles", c_uint64),
+    ]
+
+
+ProfileEntry = namedtuple("ProfileEntry", ["name", "calls", "cycles"])
+
+
+class Profiler:
+    """
+    Injects entry counters (and, with timing, timestamp counter deltas)
+    into generated functions.
+
+    Every instrumented function gets its own `<name>.__profile` global
+    which is updated with atomic adds, so the counters can be read from
+    Python at any time without locking.  A disabled profiler leaves the
+    IR untouched.
+
+    Bound engines and modules are kept alive until they are unbound,
+    either per module (see `unload_module`) or all at once with
+    `unbind_all`.
+    """
+
+    def __init__(self, enabled: bool = True, timing: bool = False):
+        self.enabled = enabled
+        self.timing = timing
+        # (engine, function name) -> (engine, module, ProfileCounters);
+        # the engine and module are kept so the counters memory stays alive
+        self._counters = {}
+
+    def instrument(self, function: ir.Function):
+        """
+        Instrument the function.  Must be called after its body is
+        generated, since timing is taken before every `ret`.
+        """
+        if not self.enabled:
+            return function
+        if not function.blocks:
+            raise ValueError(f"Function {function.name!r} has no body to instrument")
+        module = function.module
+        counters = ir.GlobalVariable(module, counters_t, f"{function.name}.__profile")
+        counters.initializer = counters_t([int64(0), int64(0)])
+        calls_p = counters.gep([int32(0), int32(0)])
+        cycles_p = counters.gep([int32(0), int32(1)])
+
+        builder = ir.IRBuilder()
+        builder.position_at_start(function.entry_basic_block)
+        builder.atomic_rmw("add", calls_p, int64(1), "monotonic")
+        if self.timing:
+            readcyclecounter = module.declare_intrinsic(
+                "llvm.readcyclecounter", fnty=ir.FunctionType(int64, [])
+            )
+            started = builder.call(readcyclecounter, [])
+            for block in function.blocks:
+                if not isinstance(block.terminator, ir.Ret):
+                    continue
+                builder.position_before(block.terminator)
+                finished = builder.call(readcyclecounter, [])
+                elapsed = builder.sub(finished, started)
+                builder.atomic_rmw("add", cycles_p, elapsed, "monotonic")
+        return function
+
+    def bind(self, engine: llvm.ExecutionEngine, module: llvm.ModuleRef):
+        """
+        Look up counters of instrumented functions of the module compiled
+        with the engine.  Counters bound earlier for a function with the
+        same name in this engine are replaced.
+        """
+        for variable in module.global_variables:
+            if variable.is_declaration or not variable.name.endswith(".__profile"):
+                continue
+            name = variable.name[:-len(".__profile")]
+            address = engine.get_global_value_address(variable.name)
+            if address:
+                counters = ProfileCounters.from_address(address)
+                self._counters[engine, name] = (engine, module, counters)
+
+    def unbind(self, module: llvm.ModuleRef):
+        """
+        Forget counters of the module.  Must be called before the module
+        is removed from its engine, as the counters live in its memory.
+        """
+        self._counters = {
+            key: bound for key, bound in self._counters.items()
+            if bound[1] is not module
+        }
+
+    def unbind_all(self):
+        """
+        Forget all counters and release the bound engines and modules.
+        """
+        self._counters = {}
+
+    def reset(self):
+        for _, _, counters in self._counters.values():
+            counters.calls = 0
+            counters.cycles = 0
+
+    def hottest(self, limit: int = None):
+        """
+        Return ProfileEntry for bound functions, hottest first.
+        Counters of a function bound in several engines are summed.
+        Functions are ranked by cycles if timing is enabled, by calls
+        otherwise.
+        """
+        totals = {}
+        for (_, name), (_, _, counters) in self._counters.items():
+            calls, cycles = totals.get(name, (0, 0))
+            totals[name] = (calls + counters.calls, cycles + counters.cycles)
+        entries = [ProfileEntry(name, *total) for name, total in totals.items()]
+        if self.timing:
+            entries.sort(key=lambda entry: (entry.cycles, entry.calls), reverse=True)
+        else:
+            entries.sort(key=lambda entry: entry.calls, reverse=True)
+        return entries[:limit]
+
+    def report(self, limit: int = None) -> str:
+        lines = [f"{'function':<40} {'calls':>12} {'cycles':>16} {'cycles/call':>12}"]
+        for name, calls, cycles in self.hottest(limit):
+            per_call = cycles // calls if calls else 0
+            lines.append(f"{name:<40} {calls:>12} {cycles:>16} {per_call:>12}")
+        return "\n".join(lines)
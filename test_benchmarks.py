@@ -0,0 +1,38 @@
+from benchmarks import compare, differences
+
+
+META = {"python": "3.11.7", "llvmlite": "0.44.0", "llvm": "15.0.7", "platform": "Linux", "time": "now"}
+
+
+def results(meta=META, **timings):
+    return {
+        "meta": dict(meta),
+        "benchmarks": {name: {"min": value, "median": value} for name, value in timings.items()},
+    }
+
+
+def test_compare_flags_slowdown_over_threshold():
+    baseline = results(fast=1.0, slow=1.0, gone=1.0)
+    current = results(fast=1.05, slow=1.5, new=9.0)
+    assert compare(current, baseline, 0.1) == [("slow", 1.0, 1.5, 1.5)]
+    assert compare(current, baseline, 0.6) == []
+
+
+def test_compare_ignores_speedup():
+    assert compare(results(a=0.5), results(a=1.0), 0.0) == []
+
+
+def test_differences_report_meta_and_benchmark_sets():
+    baseline = results(kept=1.0, gone=1.0)
+    current = results(dict(META, llvm="14.0.6", time="later"), kept=1.0, new=1.0)
+    assert differences(current, baseline) == [
+        "llvm differs: baseline 15.0.7, current 14.0.6",
+        "benchmark added: new",
+        "benchmark removed: gone",
+    ]
+
+
+def test_differences_skip_filtered_out_benchmarks():
+    baseline = results(**{"call.i64": 1.0, "get_func": 1.0})
+    current = results(**{"call.i64": 1.0})
+    assert differences(current, baseline, "call") == []
@@ -0,0 +1,98 @@
+import os
+
+import pytest
+from llvmlite import ir
+
+from benchmarks import functions_module as bench_functions_module
+from llvm_operations import compile_ir, create_execution_engine, unload_module
+from perf_map import PerfMap, elf_function_sizes
+
+
+int64 = ir.IntType(64)
+
+
+def functions_module(*names: str) -> str:
+    module = bench_functions_module("test", {name: (int64, [int64, int64]) for name in names})
+    ir.Function(module, ir.FunctionType(int64, []), "external")  # declaration only
+    return str(module)
+
+
+def read_map(path):
+    with open(path) as file:
+        return [line.split() for line in file]
+
+
+def mapped_names(path):
+    return sorted(name for _, _, name in read_map(path))
+
+
+def test_line_per_defined_function(tmp_path):
+    perf_map = PerfMap(str(tmp_path / "perf.map"))
+    engine = create_execution_engine()
+    compile_ir(engine, functions_module("add", "add2"), perf_map)
+    lines = read_map(perf_map.path)
+    assert sorted(name for _, _, name in lines) == ["add", "add2"]
+    for address, size, name in lines:
+        assert int(address, 16) == engine.get_function_address(name)
+        assert int(size, 16) > 0
+
+
+def test_non_elf_buffer_yields_nothing():
+    assert list(elf_function_sizes(b"\xcf\xfa\xed\xfe" + bytes(60))) == []
+
+
+def test_keeps_existing_lines(tmp_path):
+    path = tmp_path / "perf.map"
+    path.write_text("1000 10 interpreter\n")
+    compile_ir(create_execution_engine(), functions_module("add"), PerfMap(str(path)))
+    assert mapped_names(path) == ["add", "interpreter"]
+    PerfMap(str(path), truncate=True)
+    assert read_map(path) == []
+
+
+def test_does_not_follow_symlink(tmp_path):
+    target = tmp_path / "target"
+    target.write_text("")
+    os.symlink(target, tmp_path / "perf.map")
+    with pytest.raises(OSError):
+        PerfMap(str(tmp_path / "perf.map"), truncate=True)
+
+
+def test_maps_share_file(tmp_path):
+    path = str(tmp_path / "perf.map")
+    compile_ir(create_execution_engine(), functions_module("first"), PerfMap(path))
+    compile_ir(create_execution_engine(), functions_module("second"), PerfMap(path))
+    assert mapped_names(path) == ["first", "second"]
+
+
+def test_unload_and_recompile_appends(tmp_path):
+    perf_map = PerfMap(str(tmp_path / "perf.map"))
+    engine = create_execution_engine()
+    mod = compile_ir(engine, functions_module("add"), perf_map)
+    unload_module(engine, mod, perf_map)
+    compile_ir(engine, functions_module("add"), perf_map)
+    lines = read_map(perf_map.path)
+    assert [name for _, _, name in lines] == ["add", "add"]
+    assert int(lines[1][0], 16) == engine.get_function_address("add")
+
+
+def test_engine_owned_by_one_map(tmp_path):
+    first = PerfMap(str(tmp_path / "first.map"))
+    second = PerfMap(str(tmp_path / "second.map"))
+    engine = create_execution_engine()
+    compile_ir(engine, functions_module("one"), first)
+    with pytest.raises(RuntimeError):
+        compile_ir(engine, functions_module("two"), second)
+    # The rejected module was not added, so its function is unknown
+    assert engine.get_function_address("two") == 0
+    compile_ir(engine, functions_module("three"), first)
+    assert mapped_names(first.path) == ["one", "three"]
+    assert not os.path.exists(second.path)
+
+
+def test_register_requires_attached_engine(tmp_path):
+    perf_map = PerfMap(str(tmp_path / "perf.map"))
+    engine = create_execution_engine()
+    mod = compile_ir(engine, functions_module("add"))
+    with pytest.raises(RuntimeError):
+        perf_map.register(engine, mod)
@@ -0,0 +1,67 @@
+import gc
+from ctypes import c_int64
+
+from llvmlite import ir
+
+from benchmarks import functions_module
+from llvm_operations import compile_ir, create_execution_engine, get_func, unload_module
+from profiling import Profiler
+
+
+int64 = ir.IntType(64)
+
+
+def identity_module(profiler: Profiler) -> str:
+    return str(functions_module("test", {"identity": (int64, [int64])}, profiler))
+
+
+def compile_and_call(profiler: Profiler, calls: int):
+    engine = create_execution_engine()
+    mod = compile_ir(engine, identity_module(profiler), profiler=profiler)
+    func = get_func(engine, "identity", c_int64, (c_int64,))
+    for i in range(calls):
+        assert func(i) == i
+    return engine, mod
+
+
+def test_counts_calls():
+    profiler = Profiler(timing=True)
+    compile_and_call(profiler, 10)
+    [entry] = profiler.hottest()
+    assert entry.name == "identity"
+    assert entry.calls == 10
+    assert entry.cycles > 0
+    profiler.reset()
+    assert profiler.hottest()[0][1:] == (0, 0)
+
+
+def test_counters_outlive_engine_reference():
+    profiler = Profiler()
+    compile_and_call(profiler, 10)
+    gc.collect()
+    assert profiler.hottest()[0].calls == 10
+
+
+def test_sums_counters_of_engines():
+    profiler = Profiler()
+    compile_and_call(profiler, 3)
+    compile_and_call(profiler, 5)
+    assert profiler.hottest() == [("identity", 8, 0)]
+
+
+def test_unload_unbinds():
+    profiler = Profiler()
+    engine, mod = compile_and_call(profiler, 3)
+    unload_module(engine, mod, profiler=profiler)
+    assert profiler.hottest() == []
+
+
+def test_unbind_all():
+    profiler = Profiler()
+    compile_and_call(profiler, 3)
+    profiler.unbind_all()
+    assert profiler.hottest() == []
+
+
+def test_disabled_leaves_ir_untouched():
+    assert "__profile" not in identity_module(Profiler(enabled=False))